@@ -1,5 +1,5 @@
-from multiprocessing import Process
-from Queue import Empty
+from threading import Thread, Event
+from collections import deque
 import logging
 import numpy as np
 import math
@@ -14,34 +14,77 @@ except ImportError:
     ENABLE = False
 
 from collision_constants import CollisionConstants
+from collision_math import collision_mask
 from dsrc_visualizer import DsrcVisualizer
 from radar_visualizer import RadarVisualizer
 from video_overlay_visualizer import VideoOverlayVisualizer
 
-class CollisionAvoidance(Process):
+class CollisionAvoidance(Thread):
     """ Takes combined data and displays predicted collisions.
 
     This package is included mainly for the purpose of demonstration.
     It takes the information provided by our Combiner and calculates any predicted
     collisions displaying warnings in a simple UI.
+
+    Runs as a thread next to the Combiner so states are handed over by
+    reference; the drawing is done by OpenCV/numpy which release the GIL.
     """
 
-    def __init__(self, queue, video_file, export_interval, export_directory):
+    def __init__(self, video_file, export_interval, export_directory, prebake_path=None):
         """Setup the CA class, just empty state for now"""
-        Process.__init__(self)
-        self.queue = queue
+        Thread.__init__(self)
+        # Only the newest state matters, older ones are dropped on append
+        self.states = deque(maxlen=1)
+        self.new_state_event = Event()
+        self.stop_event = Event()
         self.video_file = video_file
         self.export_interval = export_interval
         self.export_directory = export_directory
+        self.prebake_path = prebake_path
         self.current_state = None
+        self.state_version = 0
         self.constants = CollisionConstants()
         signal.signal(signal.SIGINT, self.signal_handler)
 
     def signal_handler(self, signal, frame):
         print 'You pressed Ctrl+C!'
-        self.terminate()
-
-
+        self.stop_event.set()
+
+    def new_data_handler(self, data):
+        """ Called by the Combiner (on its own thread) whenever a new state is available """
+        # The combiner keeps updating the radar entities in place (filters), so read
+        # them here before it moves on and hand the render thread a copy it owns
+        state = dict(data)
+        self.flatten_tracks(state)
+        self.states.append(state)
+        self.new_state_event.set()
+
+    def flatten_tracks(self, state):
+        """ Flatten the radar entities into float32 arrays once per state.
+
+        The entities use per track key names ('<n>_track_range'), so this is the one
+        place those keys get built; everything downstream reads the arrays stored in
+        state['tracks'] ('ranges', 'angles', 'range_rates', one entry per entity).
+        """
+        entities = state['radar']['entities'] if state['radar'] else []
+        rows = []
+        for track in entities:
+            track_number = track['track_number']
+            rows.append((track[track_number+'_track_range'], track[track_number+'_track_angle'], \
+                track[track_number+'_track_range_rate']))
+
+        columns = np.array(rows, np.float32).reshape(-1, 3).T.copy()
+        state['tracks'] = {'ranges': columns[0], 'angles': columns[1], 'range_rates': columns[2]}
+
+    def analyze_state(self, state):
+        """ Flag the radar tracks that are on a collision course with us.
+
+        Stores a boolean array (one entry per radar entity) in state['collisions'].
+        """
+        ranges = state['tracks']['ranges']
+        lateral = ranges * np.sin(np.radians(state['tracks']['angles']))
+        state['collisions'] = collision_mask(ranges, lateral, state['tracks']['range_rates'], \
+            np.float32(self.constants.LANE_HALF_WIDTH), np.float32(self.constants.TIME_TO_COLLISION))
 
     def position_windows(self):
         cv2.moveWindow('Data Visualizer', 0, 0)
@@ -62,34 +105,46 @@ class CollisionAvoidance(Process):
 
         # Init vizualizers
         self.video_viz = VideoOverlayVisualizer(self.video_file, self.export_interval, self.export_directory, 1.2446, -0.2, 3.4, 94.4, \
-        21.0/1000, 4.55/1000)
+        21.0/1000, 4.55/1000, self.prebake_path)
 
         # self.video_viz = VideoOverlayVisualizer(self.video_file, 1.2446, -0.4, 0, 64.6, \
         # 28.0/1000, 4.55/1000)
         self.position_windows()
 
         delay_remainder = 0.0;
+        single_frame_duration = float(1000)/self.video_viz.fps
         start_time = timeit.default_timer()
+        last_drawn_version = None
 
-        while True:
+        while not self.stop_event.is_set():
             # Start timing to record how long our drawing takes
             start_frame_time = timeit.default_timer()
 
-            # Get the last element from the data queue (get rid of any old data too)
-            while self.queue.qsize() > 1:
+            # Get the last state sent by the combiner (older ones were already dropped)
+            new_state = None
+            if self.new_state_event.is_set():
+                self.new_state_event.clear()
                 try:
-                    self.current_state = self.queue.get(False)
-                except Empty:
-                    break
+                    new_state = self.states.pop()
+                except IndexError:
+                    pass
+
+            if new_state:
+                self.analyze_state(new_state)
+                self.current_state = new_state
+                self.state_version += 1
 
-            # if we don't have data yet, don't bother visualizing
+            # if we don't have data yet, don't bother visualizing, sleep until the
+            # combiner hands us something (or a frame has gone by) instead of spinning
             if not self.current_state:
+                self.new_state_event.wait(single_frame_duration / 1000)
                 continue
 
             # If we are behind in the video compared to real time, grab a new
             # frame until we are back in time
             while self.video_viz.camera.get(cv2.CAP_PROP_POS_MSEC) < (timeit.default_timer() - start_time) * 1000:
-                self.video_viz.camera.grab() # skip frames
+                if not self.video_viz.camera.grab(): # skip frames
+                    break # end of the video, update() will notice
 
             # Run the video visualization, it returns false at the end of the video
             # thus we kill the visualization at that point
@@ -97,12 +152,14 @@ class CollisionAvoidance(Process):
                 print "End of video, killing viz"
                 break
 
-            # run our other visualizations
-            self.radar_viz.update(self.current_state)
-            self.dsrc_viz.update(self.current_state)
+            # run our other visualizations, they only depend on the state so
+            # there is nothing to redraw until a new one arrives
+            if self.state_version != last_drawn_version:
+                self.radar_viz.update(self.current_state)
+                self.dsrc_viz.update(self.current_state)
+                last_drawn_version = self.state_version
 
             # Calculate how long to delay before next frame
-            single_frame_duration = float(1000)/self.video_viz.fps
             vis_drawing_time = (timeit.default_timer() - start_frame_time) * 1000
             delay_before_next_frame = single_frame_duration - vis_drawing_time + delay_remainder
 
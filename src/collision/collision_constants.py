@@ -6,3 +6,5 @@ class CollisionConstants(object):
     A = 3
     CONSTANT = 4
 
+    LANE_HALF_WIDTH = 1.8 # m, tracks further to the side are not in our path
+    TIME_TO_COLLISION = 3.0 # s, warn about anything we will reach sooner than this
@@ -0,0 +1,109 @@
+"""Numerical kernels used by the collision avoidance demo.
+
+Numba is optional; when it is not installed the kernels run as plain
+python/numpy code with the same results, just slower for many tracks.
+"""
+import numpy as np
+
+try:
+    from numba import njit, prange, vectorize
+    NUMBA_ENABLED = True
+except ImportError:
+    NUMBA_ENABLED = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        """ Stand-in for numba.njit(...), leaves the function uncompiled """
+        return lambda func: func
+
+    def vectorize(*args, **kwargs):
+        """ Stand-in for numba.vectorize(...), the kernels below are written with
+        numpy functions so they already work elementwise on arrays """
+        return lambda func: func
+
+
+@njit(cache=True, fastmath=True, parallel=True)
+def collision_mask(ranges, y, range_rate, lane_half_width, time_to_collision):
+    """
+    ranges: distance of each track from the radar (m)
+    y: lateral distance of each track from the radar (m)
+    range_rate: rate of change of each track's range (m/s, negative when closing)
+    lane_half_width: tracks further to the side than this are not in our path (m)
+    time_to_collision: flag tracks we would reach in less time than this (s)
+
+    Returns a boolean array that is true for every track on a collision course.
+    """
+    out = np.empty(ranges.shape[0], np.bool_)
+    for i in prange(ranges.shape[0]):
+        if range_rate[i] >= 0 or abs(y[i]) > lane_half_width:
+            out[i] = False
+        else:
+            out[i] = ranges[i] < -range_rate[i] * time_to_collision
+    return out
+
+
+@vectorize(['float32(float32, float32, float32, float32)'], target='parallel', fastmath=True, cache=True)
+def camera_range(obj_range, obj_angle, distance_behind_radar, distance_beside_radar):
+    """
+    Distance (m) from the camera to an object seen by the radar at obj_range (m)
+    and obj_angle (degrees); the camera sits distance_behind_radar (m) behind and
+    distance_beside_radar (m) to the side of the radar
+    """
+    obj_radians = np.radians(obj_angle)
+    triangle_opposite = distance_behind_radar + (obj_range * np.cos(obj_radians))
+    triangle_adj = distance_beside_radar + (obj_range * np.sin(obj_radians))
+    return np.sqrt(triangle_opposite * triangle_opposite + triangle_adj * triangle_adj)
+
+
+@vectorize(['float32(float32, float32, float32, float32, float32)'], target='parallel', fastmath=True, cache=True)
+def camera_angle(obj_range, obj_angle, distance_behind_radar, distance_beside_radar, camera_angle):
+    """
+    Angle (degrees) of an object seen by the radar relative to the center of the camera,
+    same arguments as camera_range() plus the camera_angle (degrees) relative to the radar
+    """
+    obj_radians = np.radians(obj_angle)
+    triangle_opposite = distance_behind_radar + (obj_range * np.cos(obj_radians))
+    triangle_adj = distance_beside_radar + (obj_range * np.sin(obj_radians))
+    new_range = np.sqrt(triangle_opposite * triangle_opposite + triangle_adj * triangle_adj)
+    return np.degrees(np.arccos(triangle_adj / new_range)) + camera_angle - 90
+
+
+# Projectors already built, keyed on the camera setup they were built for
+_PROJECTORS = {}
+
+def make_projector(distance_behind_radar, distance_beside_radar, angle_from_radar, camera_field_of_view, \
+                   focal_length, sensor_size, img_width, img_center_x, img_center_y):
+    """
+    Build project(obj_widths, obj_ranges, obj_angles) for a fixed camera setup, which returns
+    an (N, 4) float32 array of (left, top, right, bottom) pixel coordinates for the objects.
+    Arguments are the same as for the VideoOverlayVisualizer; the constants (and their
+    products/reciprocals) are worked out once here instead of on every call.
+    Projectors are cached, asking again for the same setup returns the same function.
+    """
+    key = (distance_behind_radar, distance_beside_radar, angle_from_radar, camera_field_of_view, \
+           focal_length, sensor_size, img_width, img_center_x, img_center_y)
+    if key in _PROJECTORS:
+        return _PROJECTORS[key]
+
+    behind = np.float32(distance_behind_radar)
+    beside = np.float32(distance_beside_radar)
+    angle_offset = np.float32(angle_from_radar)
+    # obj_width(pixels) = (focal length(mm) * obj width(mm) * img_width(pixels)) / (obj_range(mm) * sensor width(mm)?)
+    half_width_scale = np.float32(focal_length * img_width / (2.0 * sensor_size))
+    angle_scale = np.float32(img_width / float(camera_field_of_view))
+    center_x = np.float32(img_center_x)
+    center_y = np.float32(img_center_y)
+
+    def project(obj_widths, obj_ranges, obj_angles):
+        half_widths = half_width_scale * obj_widths / camera_range(obj_ranges, obj_angles, behind, beside)
+        img_midpoints = center_x + angle_scale * camera_angle(obj_ranges, obj_angles, behind, beside, angle_offset)
+
+        rects = np.empty((len(obj_ranges), 4), np.float32)
+        rects[:, 0] = img_midpoints - half_widths
+        rects[:, 1] = center_y - half_widths
+        rects[:, 2] = img_midpoints + half_widths
+        rects[:, 3] = center_y + half_widths
+        return rects
+
+    _PROJECTORS[key] = project
+    return project
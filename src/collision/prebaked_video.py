@@ -0,0 +1,131 @@
+import json
+import os
+import numpy as np
+try:
+    import cv2
+except ImportError:
+    pass
+
+IMG_CHANNELS = 3
+
+def source_info(videofile):
+    """ What identifies the video a set of frames was baked from """
+    stat = os.stat(videofile)
+    return {'source': os.path.abspath(videofile), 'source_size': stat.st_size, 'source_mtime': stat.st_mtime}
+
+def is_prebaked(videofile, out_path):
+    """ True if out_path holds frames baked from the current contents of videofile """
+    if not os.path.exists(out_path) or not os.path.exists(out_path + '.json'):
+        return False
+
+    with open(out_path + '.json', 'r') as meta_file:
+        meta = json.load(meta_file)
+
+    for key, value in source_info(videofile).items():
+        if meta.get(key) != value:
+            return False
+    return True
+
+def prebake(videofile, out_path):
+    """
+    Decode every frame of videofile once and write them back to back as raw BGR
+    bytes to out_path, with the fps/size/frame count and the source video's
+    path/size/mtime stored next to it in out_path.json
+    """
+    # Drop the old description first so a failed bake is never mistaken for a good one
+    if os.path.exists(out_path + '.json'):
+        os.remove(out_path + '.json')
+
+    camera = cv2.VideoCapture(videofile)
+    fps = camera.get(cv2.CAP_PROP_FPS)
+
+    frame_count = 0
+    height = width = 0
+    with open(out_path, 'wb') as out:
+        while True:
+            ret, img = camera.read()
+            if not ret:
+                break
+            height, width = img.shape[:2]
+            img.tofile(out)
+            frame_count += 1
+    camera.release()
+
+    if frame_count == 0:
+        os.remove(out_path)
+        raise ValueError("Could not decode any frames from %s, nothing to prebake" % videofile)
+
+    info = source_info(videofile)
+    info.update({'fps': fps, 'width': width, 'height': height, 'frames': frame_count})
+    with open(out_path + '.json', 'w') as meta:
+        json.dump(info, meta)
+
+def ensure_prebaked(videofile, out_path):
+    """ Run prebake() unless out_path already holds the frames of this exact video """
+    if not is_prebaked(videofile, out_path):
+        print "Prebaking %s into %s" % (videofile, out_path)
+        prebake(videofile, out_path)
+
+class PrebakedCapture(object):
+    """ Plays back frames written by prebake() through a memory map.
+
+    Implements the parts of the cv2.VideoCapture interface the visualizer uses,
+    so frames come straight out of the page cache instead of being decoded.
+    """
+
+    def __init__(self, videofile, path):
+        """ Load the frames prebaked from videofile at path, see ensure_prebaked() """
+        if not is_prebaked(videofile, path):
+            raise IOError("%s holds no up to date frames of %s, run ensure_prebaked() first" % (path, videofile))
+
+        with open(path + '.json', 'r') as meta:
+            self.meta = json.load(meta)
+
+        self.frames = np.memmap(path, mode='r', dtype=np.uint8, \
+            shape=(self.meta['frames'], self.meta['height'], self.meta['width'], IMG_CHANNELS))
+        self.position = 0
+
+    def isOpened(self):
+        return self.frames is not None
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.meta['fps']
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return self.meta['width']
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self.meta['height']
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return self.meta['frames']
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            # Timestamp of the last grabbed frame, like OpenCV reports it
+            return max(self.position - 1, 0) * 1000.0 / self.meta['fps']
+        return 0
+
+    def set(self, prop, value):
+        # Nothing is buffered or converted, there is nothing to configure
+        return False
+
+    def grab(self):
+        if self.frames is None or self.position >= len(self.frames):
+            return False
+        self.position += 1
+        return True
+
+    def retrieve(self, image=None):
+        if self.frames is None or self.position == 0:
+            return False, None
+        frame = self.frames[self.position - 1]
+        # The map is read only and we draw on the frame, so copy it out
+        if image is not None and image.shape == frame.shape:
+            np.copyto(image, frame)
+            return True, image
+        return True, np.array(frame)
+
+    def read(self, image=None):
+        if not self.grab():
+            return False, None
+        return self.retrieve(image)
+
+    def release(self):
+        self.frames = None
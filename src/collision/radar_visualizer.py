@@ -1,4 +1,3 @@
-import math
 import numpy as np
 try:
     import cv2
@@ -27,19 +26,14 @@ class RadarVisualizer(object):
 	cv2.line(img, (10, 0), (self.width/2 - 5, self.height), (100, 255, 255))
 	cv2.line(img, (self.width - 10, 0), (self.width/2 + 5, self.height), (100, 255, 255))
 
-        objs = []
-        if current_state['radar']:
-            objs = current_state['radar']['entities']
+        track_ranges = current_state['tracks']['ranges']
+        track_angles = np.radians(current_state['tracks']['angles'] + 90.0)
 
-        for track in objs:
-            track_number = track['track_number']
-            track_range = track[track_number+'_track_range']
-            track_angle = (float(track[track_number+'_track_angle'])+90.0)*math.pi/180
+        x_pos = (np.cos(track_angles)*track_ranges*4).astype(np.int32)
+        y_pos = (np.sin(track_angles)*track_ranges*4).astype(np.int32)
 
-            x_pos = math.cos(track_angle)*track_range*4
-            y_pos = math.sin(track_angle)*track_range*4
-
-            cv2.circle(img, (self.width/2 + int(x_pos), self.height - int(y_pos) - 10), 5, (255, 255, 255))
+        for x, y in zip(x_pos.tolist(), y_pos.tolist()):
+            cv2.circle(img, (self.width/2 + x, self.height - y - 10), 5, (255, 255, 255))
 
         cv2.imshow("Radar", img)
         #cv2.waitKey(1)
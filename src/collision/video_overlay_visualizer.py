@@ -5,14 +5,21 @@ try:
 except ImportError:
     pass
 
+from collision_math import make_projector
+from prebaked_video import PrebakedCapture
+
 IMG_WIDTH = 512
 IMG_HEIGHT = 512
 IMG_CHANNELS = 3
 COMBINED_RADIUS = 0.5
 COMBINED_ANGLE = 0.5
+TRACK_WIDTH = 0.2 # m, radar track widths are too noisy to use for now
+VERTICAL_OFFSET = 70 # HACK FOR A VER OFFSET FOR NOW
+PIXEL_MIN = np.iinfo(np.int16).min
+PIXEL_MAX = np.iinfo(np.int16).max
 
 class VideoOverlayVisualizer(object):
-    def __init__(self, videofile, export_interval, export_path, distance_behind_radar, distance_beside_radar, camera_angle, camera_field_of_view, focal_length, sensor_size):
+    def __init__(self, videofile, export_interval, export_path, distance_behind_radar, distance_beside_radar, camera_angle, camera_field_of_view, focal_length, sensor_size, prebake_path=None):
         """
         videopath: path to video that we will be using for image processing
         distance_behind_radar: how far the camera is behind the radar in the vehicle (m)
@@ -21,11 +28,17 @@ class VideoOverlayVisualizer(object):
         camera_field_of_view: the angular extent of the scene imaged by your camera (degrees); how many degrees can your camera see
         focal_length: focal length of the camera while filming (mm; note that we do not account for focal length changes mid_video)
         sensor_size: size of the camera sensor (mm; believe we want the height)
+        prebake_path: if set, decode the video once into this raw frame file and play it back from there
         """
-        self.camera = cv2.VideoCapture(videofile)
+        self.camera = self.open_camera(videofile, prebake_path)
+        # Live sources buffer several frames by default which puts the overlay
+        # behind the radar state, only keep the newest one (ignored for files)
+        self.camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)
         self.fps = self.camera.get(cv2.CAP_PROP_FPS)
         self.video_width = self.camera.get(cv2.CAP_PROP_FRAME_WIDTH)
         self.video_height = self.camera.get(cv2.CAP_PROP_FRAME_HEIGHT)
+        # Every frame's BGR image is written into this same buffer instead of a fresh allocation
+        self.frame = np.empty((int(self.video_height), int(self.video_width), IMG_CHANNELS), np.uint8)
 
         self.distance_behind_radar = distance_behind_radar
         self.distance_beside_radar = distance_beside_radar
@@ -38,10 +51,28 @@ class VideoOverlayVisualizer(object):
 
         self.prev_gps = None
         self.latest_dsrc_box = None
+        self.boxes_state = None
+        self.box_groups = []
         self.last_exported_frame = 0
         self.export_interval = export_interval
         self.export_path = export_path
 
+    def open_camera(self, videofile, prebake_path=None):
+        """
+        Open the video, asking OpenCV to decode on the GPU/fixed function hardware
+        when the build supports it (OpenCV >= 4.5.2) and falling back to software decode.
+        With a prebake_path the frames are decoded once up front and memory mapped instead.
+        """
+        if prebake_path:
+            return PrebakedCapture(videofile, prebake_path)
+
+        if hasattr(cv2, "CAP_PROP_HW_ACCELERATION"):
+            camera = cv2.VideoCapture(videofile, cv2.CAP_ANY, \
+                [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY])
+            if camera.isOpened():
+                return camera
+        return cv2.VideoCapture(videofile)
+
     def update(self, current_state):
         """
         To draw on the object:
@@ -52,8 +83,13 @@ class VideoOverlayVisualizer(object):
         5. Calculate top left and bottom right corners of the track object
         6. Draw the appropriate rectangle
         """
-        # Loop until the video is done
-        ret, img = self.camera.read()
+        # Loop until the video is done. grab() demuxes and decodes the next frame,
+        # retrieve() converts it to BGR (same work as read(), but lets us pass a buffer)
+        ret = self.camera.grab()
+        if ret:
+            # If the size was wrong OpenCV hands back a new buffer, reuse that from now on
+            ret, img = self.camera.retrieve(self.frame)
+            self.frame = img
 
         if not ret:
             # We have reached the end of the video
@@ -61,10 +97,31 @@ class VideoOverlayVisualizer(object):
             cv2.destroyAllWindows()
             return False
 
-        track_objects = []
-        if (current_state and current_state["radar"]):
-            track_objects = current_state["radar"]["entities"]
+        # The boxes only depend on the radar/DSRC state, so only redo the math
+        # when a new state comes in and just draw the cached boxes otherwise
+        if current_state is not self.boxes_state:
+            self.update_boxes(current_state, img.shape[1], img.shape[0])
+            self.boxes_state = current_state
+
+        # Step 6, one native call per color rather than one per box
+        for color, contours in self.box_groups:
+            cv2.drawContours(img, contours, -1, color, 3)
 
+        cv2.imshow("Data Visualizer", img)
+
+        # Save frames to disk for analysis
+        if self.export_path and self.camera.get(cv2.CAP_PROP_POS_MSEC) - self.last_exported_frame > self.export_interval:
+            print "EXPORTING"
+            self.last_exported_frame = self.camera.get(cv2.CAP_PROP_POS_MSEC)
+            cv2.imwrite(self.export_path + "/%s.jpg" % int(self.last_exported_frame), img) 
+
+        return True
+
+    def update_boxes(self, current_state, img_width, img_height):
+        """
+        Recompute the boxes to draw for a new state, steps 1-5 from update().
+        Leaves them in self.box_groups as a list of (color, contours), see group_boxes().
+        """
         if (current_state and current_state["dsrc"] and len(current_state["dsrc"]["remote_messages"])):
             remote = current_state["dsrc"]["remote_messages"][0]
             local = current_state["dsrc"]["message"]
@@ -92,74 +149,79 @@ class VideoOverlayVisualizer(object):
             if dist_from_prev > 5.0:
                 self.prev_gps = (local['long'], local['lat'])
 
-        if self.latest_dsrc_box:
-            self.draw_box_for_obj(img, 0.2, self.latest_dsrc_box[0], self.latest_dsrc_box[1], color = (255, 0, 0))
-
-        for track in track_objects:
-            track_number = track["track_number"]
-            #track_width = track[track_number+"_track_width"]
-            track_width = 0.2
-            track_range = track[track_number+"_track_range"]
-            track_angle = track[track_number+"_track_angle"]
-            if self.calc_distance((track_range, track_angle), self.latest_dsrc_box) < COMBINED_RADIUS:
-                self.draw_box_for_obj(img, track_width, track_range, track_angle, \
-                    (0,0,255))
+        # Project every track in one vectorized pass
+        widths, ranges, angles = self.track_arrays(current_state)
+        rects = self.project_boxes(widths, ranges, angles, img_width, img_height)
+        combined = self.calc_distances(ranges, angles, self.latest_dsrc_box) < COMBINED_RADIUS
+        collisions = current_state.get("collisions") if current_state else None
+        if collisions is None:
+            collisions = np.zeros(len(rects), np.bool_)
+        colors = []
+        for is_combined, is_collision in zip(combined, collisions):
+            if is_combined:
+                colors.append((0, 0, 255))
+            elif is_collision:
+                colors.append((0, 255, 255))
             else:
-                self.draw_box_for_obj(img, track_width, track_range, track_angle)
-
-        cv2.imshow("Data Visualizer", img)
+                colors.append((0, 255, 0))
 
-        # Save frames to disk for analysis
-        if self.export_path and self.camera.get(cv2.CAP_PROP_POS_MSEC) - self.last_exported_frame > self.export_interval:
-            print "EXPORTING"
-            self.last_exported_frame = self.camera.get(cv2.CAP_PROP_POS_MSEC)
-            cv2.imwrite(self.export_path + "/%s.jpg" % int(self.last_exported_frame), img) 
-
-        return True
-
-    def draw_box_for_obj(self, img, obj_width, obj_range, obj_angle, color = (0, 255, 0)):
-        # HACK FOR A VER OFFSET FOR NOW
-        vertical_offset = 70
-
-        # Step 2
-        img_height, img_width = img.shape[:2]
-
-        # Step 3
-        # Formula using: obj_width(pixels) = (focal length(mm) * obj width(mm) * img_width(pixels)) / (obj_range(mm) * sensor width(mm)?)
-        obj_range, obj_angle = self.convert_obj_to_camera(obj_range, obj_angle, self.distance_behind_radar, self.distance_beside_radar, self.camera_angle)
-        #print "obj_range: " + str(obj_range) + ", obj_range: "+str(obj_range)
-        pixel_width = ((self.focal_length) * (obj_width) * img_width) / ((obj_range) * (self.sensor_size))
-        #print "Pixel width: " + str((pixel_width, self.focal_length, img_width, obj_range, self.sensor_size))
+        if self.latest_dsrc_box:
+            dsrc_rect = self.project_boxes(np.array([TRACK_WIDTH], np.float32), np.array([self.latest_dsrc_box[0]], np.float32), \
+                np.array([self.latest_dsrc_box[1]], np.float32), img_width, img_height)
+            rects = np.concatenate((dsrc_rect, rects))
+            colors.insert(0, (255, 0, 0))
 
-        # Step 4
-        img_midpoint = (img_width / 2) + ((obj_angle / self.camera_field_of_view) * img_width)
-        #print "img_midpoint: " + str(img_midpoint) + " obj_angle: "+str(obj_angle)
+        self.box_groups = self.group_boxes(rects, colors)
 
-        # Step 5
+    def group_boxes(self, rects, colors):
+        """
+        Turn (N, 4) box corners into 4 point contours grouped by color, returns a
+        list of (color, contours) where contours is an (n, 4, 1, 2) array ready for
+        cv2.drawContours (OpenCV only takes int32 points, hence the widening here)
+        """
+        corners = np.empty((len(rects), 4, 1, 2), np.int32)
+        corners[:, 0, 0] = rects[:, [0, 1]]
+        corners[:, 1, 0] = rects[:, [2, 1]]
+        corners[:, 2, 0] = rects[:, [2, 3]]
+        corners[:, 3, 0] = rects[:, [0, 3]]
+
+        groups = []
+        for color in sorted(set(colors), key=colors.index):
+            in_group = np.array([box_color == color for box_color in colors], np.bool_)
+            groups.append((color, corners[in_group]))
+        return groups
+
+    def track_arrays(self, current_state):
+        """
+        Get the (widths, ranges, angles) float32 arrays for the radar tracks, flattened
+        into current_state["tracks"] by CollisionAvoidance
+        """
+        if not current_state or "tracks" not in current_state:
+            return np.empty(0, np.float32), np.empty(0, np.float32), np.empty(0, np.float32)
+        ranges = current_state["tracks"]["ranges"]
+        angles = current_state["tracks"]["angles"]
+        widths = np.full(len(ranges), TRACK_WIDTH, np.float32)
+        return widths, ranges, angles
+
+    def project_boxes(self, obj_widths, obj_ranges, obj_angles, img_width, img_height):
+        """
+        Vectorized version of steps 3-5 from update(); takes arrays of object widths (m),
+        ranges (m) and angles (degrees) relative to the radar and returns an (N, 4) int16
+        array of (left, top, right, bottom) pixel coordinates
+        """
+        # Steps 3-4, the projection for this camera + image size is built once and reused
         # For now, drawing squares and drawing simply on the middle of the image
         # Top left corner of image is point (0, 0)
-        img_left_side = img_midpoint - (pixel_width / 2)
-        img_right_side = img_midpoint + (pixel_width / 2)
-        img_top = (img_height / 2) - (pixel_width / 2)
-        img_bottom = (img_height / 2) + (pixel_width / 2)
+        project = make_projector(self.distance_behind_radar, self.distance_beside_radar, self.camera_angle, \
+            self.camera_field_of_view, self.focal_length, self.sensor_size, \
+            img_width, img_width // 2, (img_height // 2) + VERTICAL_OFFSET)
+
+        # Step 5
         # TODO: Add bounds checks
-        top_left = (int(img_left_side), int(img_top + vertical_offset))
-        bottom_right = (int(img_right_side), int(img_bottom + vertical_offset))
-
-        # Step 6
-        cv2.rectangle(img, top_left, bottom_right, color, 3)
-        #print "Top left: " + str(top_left)
-        #print "Bottom right: " + str(bottom_right)
-
-    def convert_obj_to_camera(self, obj_range, obj_angle, distance_behind_radar, distance_beside_radar, camera_angle):
-        triangle_opposite = distance_behind_radar + (obj_range * math.cos(math.radians(obj_angle)))
-        triangle_adj = distance_beside_radar + (obj_range * math.sin(math.radians(obj_angle)))
-        obj_range = math.sqrt(math.pow(triangle_opposite, 2) + math.pow(triangle_adj, 2))
-        #obj_angle = math.atan(triangle_opposite / triangle_adj)
-        obj_angle = math.acos(triangle_adj / obj_range)
-        obj_angle = math.degrees(obj_angle) + camera_angle
-        obj_angle = obj_angle - 90
-        return obj_range, obj_angle
+        rects = project(obj_widths, obj_ranges, obj_angles)
+        # Anything outside the int16 range is far off screen anyway (very close objects),
+        # clip so it doesn't wrap around into the image
+        return np.clip(rects, PIXEL_MIN, PIXEL_MAX).astype(np.int16)
 
     def calc_gps_distance(self, new, old):
         lon1, lat1 = new
@@ -176,14 +238,12 @@ class VideoOverlayVisualizer(object):
         r = 6371 # Radius of earth in kilometers. Use 3956 for miles
         return c * r * 1000 # conv to meters
 
-    def calc_distance(self, tuple_distance_angle_one, tuple_distance_angle_two):
-        if not tuple_distance_angle_one or not tuple_distance_angle_two:
-            return 99999999 #return something huge
-        x1 = tuple_distance_angle_one[0] * math.cos(math.radians(tuple_distance_angle_one[1]))
-        y1 = tuple_distance_angle_one[0] * math.sin(math.radians(tuple_distance_angle_one[1]))
-        x2 = tuple_distance_angle_two[0] * math.cos(math.radians(tuple_distance_angle_two[1]))
-        y2 = tuple_distance_angle_two[0] * math.sin(math.radians(tuple_distance_angle_two[1]))
-        # Calculate the distance between the 2 vectors
-        new_x = math.fabs(x2 - x1)
-        new_y = math.fabs(y2 - y1)
-        return math.sqrt(math.pow(new_x, 2) + math.pow(new_y, 2))
+    def calc_distances(self, obj_ranges, obj_angles, tuple_distance_angle):
+        """ Distance (m) from every (range, angle) pair to a single (range, angle) point """
+        if not tuple_distance_angle:
+            return np.full(len(obj_ranges), 99999999, np.float32) #return something huge
+        obj_radians = np.radians(obj_angles)
+        other_radians = math.radians(tuple_distance_angle[1])
+        new_x = tuple_distance_angle[0] * math.cos(other_radians) - obj_ranges * np.cos(obj_radians)
+        new_y = tuple_distance_angle[0] * math.sin(other_radians) - obj_ranges * np.sin(obj_radians)
+        return np.hypot(new_x, new_y)
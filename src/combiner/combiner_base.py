@@ -23,7 +23,7 @@ class Combiner(object):
     avoidance system.
     """
 
-    def __init__(self, collision_avoid_queue, log_dsrc=True, log_radar=True,
+    def __init__(self, callback=None, log_dsrc=True, log_radar=True,
                  dsrc_log_file=None, radar_log_file=None, dsrc_enabled=True,
                  radar_enabled=True, log_level="DEBUG", log_config=None):
         """ Setup Combiner, initialize DSRC+Radar event dispatcher. """
@@ -36,8 +36,7 @@ class Combiner(object):
         self.radar_enabled = radar_enabled
 
         self.data_queue = Queue()
-        self.combined_data_queue = collision_avoid_queue
-        # self.callback = callback
+        self.callback = callback
 
 
         if self.dsrc_enabled:
@@ -46,6 +45,7 @@ class Combiner(object):
             self.radar_event_dispatcher = RadarEventDispatcher(self.data_queue, log=log_radar, log_file=radar_log_file, log_level=log_level, log_config=log_config)
 
         self.logger = logging.getLogger('debug_combined')
+        self.combined_logger = logging.getLogger('combined')
 
     def start(self):
         """ Start running the event dispatcher threads (we are ready to recieve data). """
@@ -137,7 +137,8 @@ class Combiner(object):
             new_data['sideslip_angle'] = self.hex_to_int(data['sideslip_angle'], 10) / 8
         except KeyError:
             self.logger.debug("KeyError, printing data structure\n")
-            self.logger.debug(json.dumps(data))
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(json.dumps(data))
 
         # Now we deal with all of the tracks
         new_data['entities'] = list()
@@ -188,7 +189,8 @@ class Combiner(object):
             except KeyError:
                 # Shouldn't happen
                 self.logger.debug("KeyError, printing data structure\n")
-                self.logger.debug(json.dumps(data))
+                if self.logger.isEnabledFor(logging.DEBUG):
+                    self.logger.debug(json.dumps(data))
         #print(new_data['entities'])
         # self.logger.debug("FINISHED RADAR NORMALIZER, HERE IS NORMALIZED DATA\n")
         # self.logger.debug(json.dumps(new_data))
@@ -220,10 +222,13 @@ class Combiner(object):
             if LOCATION_FILTER:
                 data = location_filter(data)
         # Send updated information back to our callback function (Collision Avoidance)
-        self.combined_data_queue.put(data)
+        if self.callback:
+            self.callback(data)
 
-        # sends logs to the combined file
-        logging.getLogger('combined').info(json.dumps(data))
+        # sends logs to the combined file, serializing the whole model is expensive
+        # so don't bother when the combined log is turned off
+        if self.combined_logger.isEnabledFor(logging.INFO):
+            self.combined_logger.info(json.dumps(data))
 
         self.data_count = self.data_count + 1
         if self.data_count > 20:
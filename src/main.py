@@ -68,34 +68,40 @@ import time
 import canlib
 import logging
 import argparse
-from multiprocessing import Queue
 import os
 
 from combiner.combiner_base import Combiner
 from collision.collision_avoid import CollisionAvoidance
+from collision.prebaked_video import ensure_prebaked
 from util.logger_conf import configure_logs
 
 def main():
     """ Main application entry point. """
     args = parse_args()
 
-    configure_logs(getattr(logging, args.log_level.upper(), None))
+    configure_logs(getattr(logging, args.log_level.upper(), None), args.log_combined)
     print_header()
 
     if args.test_logger:
         test_logger()
 
-    collision_avoid_queue = Queue()
+    new_data_handler = None
 
     # Init the collision avoidance class
     if args.visualize_dir:
-        collision_avoid = CollisionAvoidance(collision_avoid_queue, args.video_file, 
-            int(args.export_interval), args.export_path)
+        # Decoding the whole video takes a while, do it before any data starts
+        # flowing so the replayed logs don't run ahead of the video
+        if args.prebake_path:
+            ensure_prebaked(args.video_file, args.prebake_path)
+
+        collision_avoid = CollisionAvoidance(args.video_file, 
+            int(args.export_interval), args.export_path, args.prebake_path)
+        new_data_handler = collision_avoid.new_data_handler
 
         collision_avoid.start()
 
     # Setup the Combiner to call collision_avoid.new_data_handler every time new data is available!
-    combiner = Combiner(collision_avoid_queue,
+    combiner = Combiner(new_data_handler,
         args.log_dsrc, args.log_radar,
         args.dsrc_log_file, args.radar_log_file,
         args.dsrc_enabled, args.radar_enabled,
@@ -104,8 +110,8 @@ def main():
     # This is a blocking call, will keep on going while parsers are going for dsrc and radar
     combiner.start()
 
-def parse_args():
-    """ Evaluate commandline arguments passed to script. """
+def _build_parser():
+    """ Describe the commandline arguments the script accepts. """
     parser = argparse.ArgumentParser()
     parser.add_argument('--no-log-dsrc',
                         dest='log_dsrc',
@@ -117,6 +123,11 @@ def parse_args():
                         default=True,
                         action='store_false',
                         help="Disable radar logging (only affect live data)")
+    parser.add_argument('--no-log-combined',
+                        dest='log_combined',
+                        default=True,
+                        action='store_false',
+                        help="Disable logging of the combined model")
     parser.add_argument('--test-logger',
                         dest='test_logger',
                         action='store_true',
@@ -144,6 +155,10 @@ def parse_args():
     parser.add_argument('--load-video',
                         dest='video_file',
                         help="Video file to draw over")
+    parser.add_argument('--prebake-video',
+                        dest='prebake_path',
+                        help="Decode the video once into this raw frame file and play it\
+                        back from there (reused on later runs if it already exists)")
     parser.add_argument('--visualize',
                         dest='visualize_dir',
                         help="Path to directory to load all vizualization info from\
@@ -155,9 +170,17 @@ def parse_args():
     parser.add_argument('--export_path',
                         dest='export_path',
                         help="Path to put screenshots in")
+    return parser
 
+# Built on first use so importing this module (e.g. a spawned child) doesn't pay for it
+_PARSER = None
 
-    args = parser.parse_args()
+def parse_args():
+    """ Evaluate commandline arguments passed to script. """
+    global _PARSER
+    if _PARSER is None:
+        _PARSER = _build_parser()
+    args = _PARSER.parse_args()
 
     if args.visualize_dir:
         args.dsrc_log_file = args.visualize_dir + '/dsrc.log'
@@ -176,7 +199,7 @@ def print_header():
     channels = cl.getNumberOfChannels()
     logging.info("/-------------------------------------------------\\")
     logging.info("| Booting DSRC+Radar Collision Avoidance")
-    logging.info("| Canlib running version %s with %s channels" % (cl.getVersion(), channels))
+    logging.info("| Canlib running version %s with %s channels", cl.getVersion(), channels)
     logging.info("\-------------------------------------------------/\n")
 
 def test_logger():
@@ -36,8 +36,12 @@ class USecFormatter(logging.Formatter):
         return s
 
 
-def configure_logs(log_level):
-    """ Configures the system logs wrt to our combined DSRC/radar system """
+def configure_logs(log_level, log_combined=True):
+    """ Configures the system logs wrt to our combined DSRC/radar system
+
+    log_combined: write every combined model to logs/combined.log, turning this
+    off also lets the Combiner skip serializing the model altogether
+    """
     if not isinstance(log_level, int):
         raise ValueError('Invalid log level %s' % loglevel)
 
@@ -162,7 +166,7 @@ def configure_logs(log_level):
     # set logger levels
     l_dsrc.setLevel(logging.DEBUG)
     l_radar.setLevel(logging.DEBUG)
-    l_combined.setLevel(logging.DEBUG)
+    l_combined.setLevel(logging.DEBUG if log_combined else logging.WARNING)
     l_collision.setLevel(logging.DEBUG)
     l_debug.setLevel(log_level)
     l_debug_dsrc.setLevel(log_level)